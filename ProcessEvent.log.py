@@ -22,7 +22,6 @@ Current Limitations/future improvment ideas
 * Allow a nesting hierarchy of error messages, e.g. Java exception, with many subtypes
 * Associate input files to specific server in a cluster
 * Results from different input files are not time sorted in output.
-* Implement concurent processing of multiple input files
 """
 import sys
 import os
@@ -34,13 +33,30 @@ from collections import deque
 #from operator import attrgetter
 import statistics
 import csv
+import codecs
+import io
+import locale
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 timestampFormat = '%m/%d/%Y %H:%M:%S'
 
+# Event logs can run to gigabytes, read them in large chunks
+readBufferSize = 1 << 20
+# Characters of a file held in memory at once when scanning with EventPattern._scanner
+scanChunkSize = 16 << 20
+# Files larger than this are split at line breaks into parts parsed in parallel
+splitSize = 64 << 20
+
 # Regex used to match relevant loglines 
 #Example line: 02/04/2015 12:33:35, 0, 0, 2, Thr 6480, Agentry Startup
-#line_regex = re.compile(r"(\d{2}[-/]\d{2}[-/]\d{4}\s+\d{2}:\d{2}:\d{2}),\s*(\d+),\s*(\d+),\s*(\d+),\s*Thr\s*(\d+),\s*(.*)")
-#                           Date                       Time             , Type   , Group  , Id     ,        thread, Message
+LINE_RE = re.compile(r"^(\d{2}[-/]\d{2}[-/]\d{4}\s+\d{2}:\d{2}:\d{2}),\s*(\d+),\s*(\d+),\s*(\d+),\s*Thr\s*(\d+),\s*(.*)")
+#                        Date                       Time             , Type   , Group  , Id     ,        thread, Message
+# Event lines are used straight from the match: group(2) is the type, compared as an int,
+# and group(6) the message, stripped before it is matched against the EventPatterns.
 
 
 #Command Line switches
@@ -54,164 +70,294 @@ typeFilter = None
 debug = False
 hideValues = False
 
-def line_regex():
-    return re.compile(r"(\d{2}[-/]\d{2}[-/]\d{4}\s+\d{2}:\d{2}:\d{2}),\s*(\d+),\s*(\d+),\s*(\d+),\s*Thr\s*(\d+),\s*(.*)")
+# Constructs that stop a top level regEx from being folded into a combined alternation.
+# Named groups are stripped when combining, so back references would no longer resolve.
+_backReference = re.compile(r"\\[1-9]|\(\?P=")
+_namedGroup = re.compile(r"\(\?P<\w+>")
+# Anchors and lookarounds behave differently mid-file than at the ends of a stripped message,
+# so patterns using them can't be part of the whole file scanner.
+_lineBoundAssertion = re.compile(r"\$|\\[AZ]|\(\?<?[=!]|(?<!\[)\^")
+# Hyperscan reads patterns as PCRE, so only this subset, which both read alike, is passed on.
+# For example re reads x{,2} as x{0,2} where PCRE reads it as literal text.
+_hsEscape = r"\\[dDsSwWnrt]|\\[!-/:-@\[-`{-~ ]"
+_hsSyntax = re.compile(r"(?:" + "|".join([
+    _hsEscape + r"|\\[bB]",                                      # escapes
+    r"\[\^?\]?(?:" + _hsEscape + r"|[^\\\[\]])*\]",              # character classes, no [:posix:]
+    r"\((?!\?)|\(\?:|\)|\||\.",                                  # groups, alternation, any
+    r"(?:[*+?]|\{\d+(?:,\d*)?\})\??(?![*+?{])",                    # quantifiers, no possessive
+    r"[^\\\[\](){}*+?|.^$]",                                      # literals
+]) + r")*\Z")
 
 class EventPattern:
+    __slots__ = ('patternId', 'name', 'regEx', 'userError', 'groupValues', 'parentId', 'occurrences', 'subPatterns')
     _patterns = []
+    _byId = {}
+    _prefixGroups = {}
+    _scanner = None
+    _hsDatabase = None
     def __init__(self, name, regEx, parent, userError):
         self.patternId = (name)
         self.name = name
         self.regEx = re.compile(regEx)
         self.userError = userError
 
-        self.groupNames = []
-        self.groupValues = []
-        for i in self.regEx.groupindex:
-            self.groupNames.append(i)
-            self.groupValues.append(set())
+        self.groupValues = {name: set() for name in self.regEx.groupindex}
         self.parentId = (parent)
-        self.events = []
+        self.occurrences = 0
         self.subPatterns = []
-        if len(self.parentId) > 0:
-            EventPattern.addSubPattern(self)
-        else:
+        if len(self.parentId) == 0:
             EventPattern._patterns.append(self)
+        elif not EventPattern.addSubPattern(self):
+            return
+        EventPattern._byId.setdefault(self.patternId, self)
 
     @staticmethod
     def addSubPattern(pattern):
-        ret = False
-        for p in EventPattern._patterns:
-            if pattern.parentId == p.patternId:
-                p.subPatterns.append(pattern)
-                ret = True
-                break
-            else:
-                sp = EventPattern.findSubPatternWithId(p, pattern.parentId)
-                if sp != None:
-                    sp.subPatterns.append(pattern)
-                    ret = True
-                    break
-        return ret
-
-    @staticmethod
-    def findSubPatternWithId(pattern, id):
-        for p in pattern.subPatterns:
-            if p.patternId == id:
-                return p
-            sp = EventPattern.findSubPatternWithId(p, id)
-            if sp != None:
-                return sp
-        return None
-        
-
+        parent = EventPattern._byId.get(pattern.parentId)
+        if parent == None:
+            return False
+        parent.subPatterns.append(pattern)
+        return True
         
     @staticmethod
     def loadCsvFile(file):
         with open(file) as csv_file:
-            csv_reader = csv.DictReader(csv_file)
+            csv_reader = csv.reader(csv_file)
+            header = next(csv_reader)
+            nameIndex = header.index('Name')
+            regExIndex = header.index('MessageRegEx')
+            parentIndex = header.index('parent')
+            userErrorIndex = header.index('UserError')
             line_count = 0
             for row in csv_reader:
+                if not row:
+                    continue
                 if debug:
-                    print(row)
-                EventPattern(row['Name'], row['MessageRegEx'], row['parent'], row['UserError'])
+                    print(dict(zip(header, row)))
+                EventPattern(row[nameIndex], row[regExIndex], row[parentIndex], row[userErrorIndex])
                 line_count +=1
-        
+        EventPattern._buildPrefixGroups()
+        EventPattern._buildScanner()
+
     @staticmethod
-    def mainMatchEvent(event):
-        ret = None
-        if typeFilter != None and event.type != typeFilter:
+    def _combinable(pattern):
+        """True if pattern's regEx can be one alternative of a combined regex
+
+        Inline flags such as (?i) would apply to every alternative (older Pythons only warn),
+        and back references would no longer resolve once named groups are stripped.
+        """
+        return not (pattern.regEx.flags & ~re.UNICODE or _backReference.search(pattern.regEx.pattern))
+
+    @staticmethod
+    def _literalPrefix(pattern):
+        """Leading literal character every match of a top level pattern starts with, else None"""
+        source = pattern.regEx.pattern
+        if not source[:1].isalnum() or source[1:2] in ('*', '?', '{') or '|' in source:
+            return None
+        if pattern.regEx.flags & re.IGNORECASE:
             return None
+        return source[0]
+
+    @staticmethod
+    def _buildPrefixGroups():
+        """Fold top level patterns sharing a leading literal into one alternation per prefix
+
+        Each prefix maps to a list of (regEx, members) entries, where members is a list of
+        (index, pattern) in csv file order.  A combined entry names each alternative p<n>,
+        so match.lastgroup identifies which member fired.  Patterns that can't be combined
+        keep their own compiled regEx as a single member entry.
+        """
+        buckets = {}
+        for index, p in enumerate(EventPattern._patterns):
+            buckets.setdefault(EventPattern._literalPrefix(p), []).append((index, p))
+        EventPattern._prefixGroups = {None: []}
+        for prefix, bucket in buckets.items():
+            entries = []
+            combinable = [m for m in bucket if EventPattern._combinable(m[1])]
+            if len(combinable) > 1:
+                source = "|".join("(?P<p{0}>{1})".format(n, _namedGroup.sub("(?:", p.regEx.pattern))
+                                  for n, (index, p) in enumerate(combinable))
+                try:
+                    entries.append((re.compile(source), combinable))
+                except re.error:
+                    combinable = []
+            else:
+                combinable = []
+            for m in bucket:
+                if m not in combinable:
+                    entries.append((m[1].regEx, [m]))
+            entries.sort(key=lambda e: e[1][0][0])
+            EventPattern._prefixGroups[prefix] = entries
+
+    @staticmethod
+    def _buildScanner():
+        """Build a regex finding candidate event lines across a whole file, if the patterns allow it
+
+        Only used when no pattern has sub patterns.  The scanner is LINE_RE with the message
+        group replaced by an alternation of all top level patterns, so it is found at the start
+        of every line the line by line match would count.  Hits are re-checked with LINE_RE and
+        mainMatchEvent, so the scanner only has to avoid missing lines, never to be exact.
+        When the optional hyperscan package is installed the scanner is also compiled into a
+        Hyperscan database, which finds the same lines with DFA matching instead of backtracking.
+        """
+        EventPattern._scanner = None
+        EventPattern._hsDatabase = None
+        if len(EventPattern._patterns) == 0:
+            return
+        sources = []
         for p in EventPattern._patterns:
-            match = p.regEx.match(event.message)
-            if not match:
-                continue
-            if len(p.subPatterns) > 0:
-                sp = EventPattern.matchEvent(p, event)
-                if sp != None:
-                    print
-                    return sp
-            ret = p
-            p.addEvent(event, match)
-            break
-        return ret
-
-    def matchEvent(self, event):
-        ret = None
-        match = self.regEx.match(event.message)
-        if not match:
+            source = p.regEx.pattern
+            if len(p.subPatterns) > 0 or not EventPattern._combinable(p) or _lineBoundAssertion.search(source):
+                return
+            sources.append(_namedGroup.sub("(?:", source))
+        linePrefix = LINE_RE.pattern[:-len("(.*)")]
+        if typeFilter != None:
+            # Filtered out types then never reach mainMatchEvent; the first (\d+) group is the type
+            linePrefix = linePrefix.replace(r"(\d+)", "(0*{0})".format(typeFilter), 1)
+        try:
+            EventPattern._scanner = re.compile(linePrefix + "(?:" + "|".join(sources) + ")", re.MULTILINE)
+        except re.error:
+            EventPattern._scanner = None
+            return
+        if hyperscan == None or codecs.lookup(locale.getpreferredencoding(False)).name != 'utf-8':
+            # The database matches UTF-8 bytes, so logs read in any other encoding keep the re scanner
+            return
+        if not all(_hsSyntax.match(source) for source in sources):
+            return
+        # Match characters rather than bytes, with Unicode \w, \s and \d like re
+        # (Hyperscan rejects these combined with start of match reporting, so only ends are reported)
+        flags = hyperscan.HS_FLAG_MULTILINE | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        # Run on to the end of the line so each event line reports a match ending on its line break
+        source = EventPattern._scanner.pattern + r"[^\n]*(?:\n|\z)"
+        try:
+            database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+            database.compile(expressions=[source.encode()], flags=flags)
+            # Check non-ASCII text matches as it does with re: "\u00e9 \u00fc" is \w, \s and . in 5 bytes
+            probe = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+            probe.compile(expressions=[r"^\w\s.$".encode()], flags=flags)
+            ends = []
+            probe.scan("\u00e9 \u00fc".encode(), match_event_handler=lambda id, start, stop, flags, context: ends.append(stop))
+        except hyperscan.error:
+            return
+        if ends != [5]:
+            return
+        EventPattern._hsDatabase = database
+
+    @staticmethod
+    def _matchTopLevel(message):
+        """Return (pattern, match) for the first top level pattern matching message, else None"""
+        best = None
+        prefixGroups = EventPattern._prefixGroups
+        for entries in (prefixGroups.get(message[:1], ()), prefixGroups.get(None, ())):
+            for regEx, members in entries:
+                if best != None and members[0][0] > best[0]:
+                    break
+                match = regEx.match(message)
+                if not match:
+                    continue
+                if len(members) == 1:
+                    index, p = members[0]
+                else:
+                    index, p = members[int(match.lastgroup[1:])]
+                    match = None
+                if best == None or index < best[0]:
+                    best = (index, p, match)
+        if best == None:
+            return None
+        index, p, match = best
+        if match == None:
+            match = p.regEx.match(message)
+        return p, match
+        
+    @staticmethod
+    def mainMatchEvent(lineMatch):
+        """Record the event.log line matched by LINE_RE against the first matching pattern"""
+        if typeFilter != None and int(lineMatch.group(2)) != typeFilter:
+            return None
+        message = lineMatch.group(6).strip()
+        found = EventPattern._matchTopLevel(message)
+        if found == None:
             return None
+        p, match = found
+        return p.matchEvent(message, match)
+
+    def matchEvent(self, message, match=None):
+        """Record message against the deepest matching pattern; match is this pattern's own match if already known"""
+        ret = None
+        if match == None:
+            match = self.regEx.match(message)
+            if not match:
+                return None
         if len(self.subPatterns) > 0:
             for p in self.subPatterns:
-                ret = EventPattern.matchEvent(p, event)
+                ret = EventPattern.matchEvent(p, message)
                 if ret != None:
                     #print("   "+ p.name)
                     return p
-        self.addEvent(event, match)
+        self.addEvent(match)
         return self
     
-    def addEvent(self, event, match):
-        self.events.append(event)
-        for ng in match.groupdict():
-            index = self.groupNames.index(ng)
-            value = match.group(ng)
+    def addEvent(self, match):
+        self.occurrences += 1
+        for ng, value in match.groupdict().items():
             if value == None:
                 value = "-None-"
-            self.groupValues[index].add(value)
+            self.groupValues[ng].add(value)
             
+    @staticmethod
+    def takeResults():
+        """Return {position: (occurrences, groupValues)} for patterns that matched, and reset their counts
+
+        Patterns are identified by their position in a depth first walk of the pattern tree,
+        since a Name may be used by more than one csv row.
+        """
+        results = {}
+        for position, p in enumerate(EventPattern._walkPatterns(EventPattern._patterns)):
+            if p.occurrences > 0:
+                results[position] = (p.occurrences, p.groupValues)
+                p.occurrences = 0
+                p.groupValues = {name: set() for name in p.regEx.groupindex}
+        return results
+
+    @staticmethod
+    def mergeResults(results):
+        """Add results returned by takeResults, e.g. from another process, into this pattern tree"""
+        patterns = list(EventPattern._walkPatterns(EventPattern._patterns))
+        for position, (occurrences, groupValues) in results.items():
+            p = patterns[position]
+            p.occurrences += occurrences
+            for name, values in groupValues.items():
+                p.groupValues[name].update(values)
+
+    @staticmethod
+    def _walkPatterns(patterns):
+        """Yield patterns and all their sub patterns, depth first"""
+        for p in patterns:
+            yield p
+            yield from EventPattern._walkPatterns(p.subPatterns)
+
     @staticmethod
     def printResults():
         for p in EventPattern._patterns:
             print(p)
             
     def __str__(self):
-        occurances = len(self.events)
+        occurances = self.occurrences
         if occurances == 0 and not showDetail and len(self.subPatterns) == 0:
             return("")
         description = self.regEx.pattern
         if not debug and len(self.userError) > 0:
             description = self.userError
+        parts = []
         if hideValues:
-            ret = "{1:4d}, {0}, \"{2}\"\n".format(self.name, occurances, description)
+            parts.append("{1:4d}, {0}, \"{2}\"\n".format(self.name, occurances, description))
         else:
-            ret = "*** {1:4d}x {0} - {2}\n".format(self.name, occurances, description)
-            if self.groupNames != None:
-                for n in self.groupNames:
-                    if n[0] == '_' and not showDetail:
-                        continue
-                    index = self.groupNames.index(n)
-                    numValues = len((self.groupValues[index]))
-                    if numValues > 0:
-                        values = ', '.join(self.groupValues[index])
-                    else:
-                        values = ''
-                    ret +=  "  {0} ({2}): {1}\n".format(n, values, numValues)
-
-        for p in self.subPatterns:
-            ret += p.__str__()
-
-        return (ret)
-    __repr__ = __str__
-
-class Event:
-    """A parsed line from event.log """
-#                           Date                       Time             , Type   , Group  , Id     ,        thread, Message
-
-    def __init__(self, match):
-##        self.timestamp = match.group(1)
-##        if start and self.timestamp < start:
-##            raise ValueError('Line pior to start time')
-##        if end and self.timestamp > end:
-##            raise ValueError('Line after end time')
-        self.match = match    #ToDo LRB: Review need to store full match object.
-        self.type = int(match.group(2))
-        self.group = match.group(3)
-        self.id = match.group(4)
-        self.thread = match.group(5)
-        self.message = match.group(6).strip()
-
-    def __str__(self):
-        return ("{0} {1} {2} {2} Thr{3}-{4}".format(self.type, self.group, self.id, self.thread, self.message))
+            parts.append("*** {1:4d}x {0} - {2}\n".format(self.name, occurances, description))
+            parts.extend("  {0} ({2}): {1}\n".format(n, ', '.join(valueSet), len(valueSet))
+                         for n, valueSet in self.groupValues.items()
+                         if n[0] != '_' or showDetail)
+        parts.extend(p.__str__() for p in self.subPatterns)
+        return "".join(parts)
     __repr__ = __str__
 
 class Repo:
@@ -229,32 +375,207 @@ class Repo:
         EventPattern.loadCsvFile(eventPatternFile)
                 
 
+class _ByteRange(io.RawIOBase):
+    """Raw reader over bytes start to stop of a file, so part of a log reads like a whole file"""
+
+    def __init__(self, fileName, start, stop):
+        self._file = open(fileName, "rb", buffering=0)
+        self._file.seek(start)
+        self._remaining = stop - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        size = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= size
+        return size
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def _openLog(fileName, mode, start=0, stop=None):
+    """Open an event.log file, or the part of it from byte start to stop, for a single sequential pass"""
+    if stop == None:
+        in_file = open(fileName, mode, buffering=readBufferSize)
+    else:
+        in_file = io.BufferedReader(_ByteRange(fileName, start, stop), readBufferSize)
+        if mode == "r":
+            in_file = io.TextIOWrapper(in_file, encoding=locale.getpreferredencoding(False))
+    if hasattr(os, 'posix_fadvise'):
+        # Widen the kernel's read ahead so disk reads overlap with parsing
+        try:
+            os.posix_fadvise(in_file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    return in_file
+
+def parseFile(fileName, start=0, stop=None):
+    """Match each line of one event.log file against the loaded event patterns, returns (lines, matches)
+
+    Line and match counts are only reported with -debug; without it the file may be scanned
+    with EventPattern._scanner instead, and both counts are None.
+    start and stop select part of the file by byte offset; both must be at the start of a line.
+    """
+    if debug:
+        if stop == None:
+            print ("********* Processing file {0}\n".format(fileName))
+        else:
+            print ("********* Processing file {0} bytes {1}-{2}\n".format(fileName, start, stop))
+    elif EventPattern._scanner != None:
+        scanFile(fileName, start, stop)
+        return None, None
+    lines = 0
+    matches = 0
+    lineMatch = LINE_RE.match
+    mainMatchEvent = EventPattern.mainMatchEvent
+    with _openLog(fileName, "r", start, stop) as in_file:
+        # Loop over each log line
+        for line in in_file:
+            # If log line matches our regex, print to console, and output file
+            lines += 1
+            # Cheap check for a leading date so blank and continuation lines skip the regex
+            if len(line) < 20 or line[2] not in '/-' or not line[:2].isdigit():
+                continue
+            match = lineMatch(line)
+            if match:
+                matches += 1
+                mainMatchEvent(match)
+    return lines, matches
+
+def _fileChunks(in_file, lineBreak):
+    """Yield the contents of in_file in blocks of about scanChunkSize that end on a line break
+
+    Only the last block, holding the file's final line, may lack the trailing line break.
+    """
+    rest = in_file.read(0)
+    while True:
+        chunk = in_file.read(scanChunkSize)
+        if not chunk:
+            if rest:
+                yield rest
+            return
+        block = rest + chunk
+        end = block.rfind(lineBreak) + 1
+        if end == 0:
+            rest = block
+            continue
+        rest = block[end:]
+        yield block[:end]
+
+def scanFile(fileName, start=0, stop=None):
+    """Find event lines of one event.log file with EventPattern._scanner
+
+    The file is read in chunks ending on a line break.  Only lines the scanner finds are
+    handed to LINE_RE and mainMatchEvent, everything else is skipped inside the regex engine.
+    """
+    if EventPattern._hsDatabase != None:
+        return _hsScanFile(fileName, start, stop)
+    lineMatch = LINE_RE.match
+    mainMatchEvent = EventPattern.mainMatchEvent
+    search = EventPattern._scanner.search
+    with _openLog(fileName, "r", start, stop) as in_file:
+        for text in _fileChunks(in_file, '\n'):
+            end = len(text)
+            pos = 0
+            while True:
+                hit = search(text, pos)
+                if not hit:
+                    break
+                lineStart = hit.start()
+                pos = text.find('\n', lineStart) + 1
+                if pos == 0:
+                    pos = end
+                match = lineMatch(text[lineStart:pos])
+                if match:
+                    mainMatchEvent(match)
+
+def _hsScanFile(fileName, start=0, stop=None):
+    """scanFile using EventPattern._hsDatabase; the file is scanned as UTF-8 bytes and event lines decoded"""
+    lineMatch = LINE_RE.match
+    mainMatchEvent = EventPattern.mainMatchEvent
+    with _openLog(fileName, "rb", start, stop) as in_file:
+        for data in _fileChunks(in_file, b'\n'):
+            end = len(data)
+            # Fail on bad UTF-8 as reading the file as text does; the database must only see valid UTF-8
+            data.decode('utf-8')
+            ends = []
+            EventPattern._hsDatabase.scan(data, match_event_handler=lambda id, start, stop, flags, context: ends.append(stop))
+            # Each hit ends on the line break (or end of data) closing the line it was found on
+            for lineStart in sorted(set(data.rfind(b'\n', 0, stop - 1) + 1 for stop in ends)):
+                pos = data.find(b'\n', lineStart) + 1
+                if pos == 0:
+                    pos = end
+                match = lineMatch(data[lineStart:pos].decode('utf-8'))
+                if match:
+                    mainMatchEvent(match)
+
+def _initWorker(patternFile, filter, debugOn):
+    """Give a worker process the command line settings and its own freshly loaded pattern tree"""
+    global eventPatternFile, typeFilter, debug
+    eventPatternFile = patternFile
+    typeFilter = filter
+    # The parent process already dumped the csv rows with -debug
+    debug = False
+    EventPattern._patterns = []
+    EventPattern._byId = {}
+    EventPattern.loadCsvFile(eventPatternFile)
+    debug = debugOn
+
+def _parseFileInWorker(fileName, start, stop):
+    lines, matches = parseFile(fileName, start, stop)
+    return lines, matches, EventPattern.takeResults()
+
+def _fileParts(fileName, parts):
+    """Split a file into up to parts (fileName, start, stop) byte ranges that begin on line starts"""
+    if parts < 2:
+        return [(fileName, 0, None)]
+    size = os.path.getsize(fileName)
+    offsets = [0]
+    with open(fileName, "rb") as in_file:
+        for i in range(1, parts):
+            # Move on to the start of the line after the one holding the split point
+            in_file.seek(size * i // parts - 1)
+            in_file.readline()
+            offset = in_file.tell()
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    offsets.append(size)
+    return [(fileName, offsets[i], offsets[i + 1]) for i in range(len(offsets) - 1)]
+
 def mainLoop(files = ['events.log'], users=[]):
     """Main processing loop"""    
     store = Repo();
     lines = 0
     matches = 0
-    regex = None
-    regex = line_regex()
+    cpus = os.cpu_count() or 1
+    tasks = []
     for fileName in files:
-        if debug:
-            print ("********* Processing file {0}\n".format(fileName))
-        with open(fileName, "r") as in_file:
-            # Loop over each log line
-            for line in in_file:
-                # If log line matches our regex, print to console, and output file
-                lines += 1
-                match = regex.match(line)
-                if match:
-                    matches += 1
-                    try:
-                        e = Event(match)
-                        #print('Match Found: {0}'.format(line))
-                    except ValueError:
-                        pass
-                        print('Matching line skipped: {0}'.format(line))
-                    else:
-                        EventPattern.mainMatchEvent(e)
+        tasks.extend(_fileParts(fileName, min(cpus, os.path.getsize(fileName) // splitSize)))
+    if len(tasks) > 1:
+        # Input files and parts of large files are independent, so parse them in parallel
+        # and merge the pattern results
+        workers = min(len(tasks), cpus)
+        with ProcessPoolExecutor(workers, initializer=_initWorker,
+                                 initargs=(eventPatternFile, typeFilter, debug)) as executor:
+            for fileLines, fileMatches, results in executor.map(_parseFileInWorker, *zip(*tasks)):
+                if fileLines != None:
+                    lines += fileLines
+                    matches += fileMatches
+                EventPattern.mergeResults(results)
+    else:
+        for task in tasks:
+            fileLines, fileMatches = parseFile(*task)
+            if fileLines != None:
+                lines += fileLines
+                matches += fileMatches
     if debug:
         print ('******************** Finished processing all files ***********************************')
         print ("Lines found {0}".format(lines))
@@ -303,7 +624,9 @@ def myMain(argv):
                 if arg.find('*') <0:
                     files.append(arg)
                 else:
-                    files.append(glob.glob(arg))
+                    files.extend(glob.glob(arg))
+        # Wildcards may overlap each other or explicit names, only parse each file once
+        files = list(dict.fromkeys(files))
         if eventPatternFile == None:
             print ("Need to specify an EventPatterns.csv file")
             return
@@ -319,6 +642,7 @@ def myMain(argv):
 
 if __name__ == '__main__':
     myMain(sys.argv)
-else:
+elif __name__ != '__mp_main__':
+    # Not when re-imported to start a worker process
     mainLoop()
     